@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concurrencia del ProjectStore - Icon Bay Torres
+Simula muchas sesiones que leen snapshots y guardan hitos a la vez,
+y reporta rendimiento y latencias de lecturas y escrituras.
+
+Uso: python benchmark_concurrencia.py --sesiones 64 --segundos 5
+"""
+
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from streamlit_app import ConstructionManager, ProjectStore
+
+
+def simular_sesion(store, fin, proporcion_escrituras, hitos_por_escritura, semilla, resultados):
+    """Bucle de una sesión: lee el snapshot y calcula KPIs, o guarda cambios sobre su versión"""
+    rng = random.Random(semilla)
+    cm = ConstructionManager()
+    ids = cm.df['id'].tolist()
+    snapshot = store.snapshot()
+    lecturas, escrituras = [], []
+    aplicados = conflictos = 0
+
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        if rng.random() < proporcion_escrituras:
+            seleccion = rng.sample(ids, hitos_por_escritura)
+            cambios = pd.DataFrame({
+                "id": seleccion,
+                "avance": [rng.randint(0, 100) for _ in seleccion],
+                "mes_real": [rng.randint(1, 13) for _ in seleccion],
+            })
+            resultado = store.commit(cambios, base_version=snapshot.version)
+            escrituras.append(time.perf_counter() - inicio)
+            aplicados += len(resultado.aplicados)
+            conflictos += len(resultado.conflictos)
+            # Igual que la interfaz: tras guardar, la sesión toma el snapshot vigente
+            snapshot = store.snapshot()
+        else:
+            cm.df = store.snapshot().df.copy(deep=False)
+            cm.calculate_kpis()
+            lecturas.append(time.perf_counter() - inicio)
+
+    resultados.append((lecturas, escrituras, aplicados, conflictos))
+
+
+def resumen_latencias(nombre, latencias, segundos):
+    """Formatea rendimiento y percentiles de latencia en milisegundos"""
+    if not latencias:
+        return f"{nombre:<12} sin operaciones"
+    ms = np.array(latencias) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return (f"{nombre:<12} {len(ms):>8} ops  {len(ms) / segundos:>10.1f} ops/s  "
+            f"p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms  máx {ms.max():.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de lecturas y escrituras concurrentes")
+    parser.add_argument("--sesiones", type=int, default=64, help="Sesiones simuladas en paralelo")
+    parser.add_argument("--segundos", type=float, default=5.0, help="Duración de la prueba")
+    parser.add_argument("--escrituras", type=float, default=0.2,
+                        help="Proporción de operaciones que son escrituras (0-1)")
+    parser.add_argument("--hitos-por-escritura", type=int, default=3,
+                        help="Hitos modificados en cada escritura")
+    args = parser.parse_args()
+
+    store = ProjectStore(ConstructionManager().df)
+    resultados = []
+    fin = time.perf_counter() + args.segundos
+    hilos = [
+        threading.Thread(target=simular_sesion,
+                         args=(store, fin, args.escrituras, args.hitos_por_escritura, i, resultados))
+        for i in range(args.sesiones)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    lecturas = [lat for r in resultados for lat in r[0]]
+    escrituras = [lat for r in resultados for lat in r[1]]
+    aplicados = sum(r[2] for r in resultados)
+    conflictos = sum(r[3] for r in resultados)
+
+    print(f"Sesiones: {args.sesiones} • Duración: {duracion:.2f} s • "
+          f"Escrituras: {args.escrituras:.0%} • Hitos por escritura: {args.hitos_por_escritura}")
+    print(resumen_latencias("Lecturas", lecturas, duracion))
+    print(resumen_latencias("Escrituras", escrituras, duracion))
+    print(f"Commits agrupados: {store.stats['commits']} • "
+          f"Escrituras por commit: {store.stats['escrituras'] / max(store.stats['commits'], 1):.1f} • "
+          f"Versión final: {store.version}")
+    print(f"Hitos aplicados: {aplicados} • Conflictos: {conflictos} "
+          f"({conflictos / max(aplicados + conflictos, 1):.1%})")
+
+
+if __name__ == "__main__":
+    main()
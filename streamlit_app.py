@@ -13,8 +13,24 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import namedtuple
+from pathlib import Path
 import io
 import base64
+import json
+import queue
+import threading
+import time
+
+# Ingesta de campo: configuración fija del servidor, no editable desde la interfaz
+INGESTA_DIR = Path(__file__).resolve().parent / "avances_entrada"
+INGESTA_PUERTO = 8765
+INGESTA_MAX_BYTES = 10 * 1024 * 1024
+
+# Copy-on-Write (siempre activo desde pandas 3): modificar una vista de un snapshot nunca altera el original
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 # Configuración de la página
 st.set_page_config(
@@ -69,6 +85,8 @@ st.markdown("""
 
 class ConstructionManager:
     def __init__(self):
+        # En la app, self.df es una vista del snapshot compartido: nunca se modifica in situ,
+        # los cambios se envían con ProjectStore.commit
         self.load_data()
     
     def load_data(self):
@@ -234,12 +252,411 @@ class ConstructionManager:
         self.df.to_csv(output, index=False, encoding='utf-8')
         return output.getvalue()
 
+ProjectSnapshot = namedtuple('ProjectSnapshot', ['version', 'df', 'hito_versions'])
+CommitResult = namedtuple('CommitResult', ['version', 'aplicados', 'conflictos'])
+
+class ProjectStore:
+    """Estado compartido entre sesiones: lecturas por snapshot inmutable y escrituras con commit agrupado"""
+    
+    def __init__(self, df, max_group=256):
+        df = df.reset_index(drop=True)
+        # Los snapshots publicados nunca se modifican; cada commit publica uno nuevo
+        hito_versions = np.zeros(len(df), dtype=np.int64)
+        hito_versions.setflags(write=False)
+        self._snapshot = ProjectSnapshot(0, df, hito_versions)
+        self.max_group = max_group
+        self.stats = {"escrituras": 0, "commits": 0, "conflictos": 0}
+        self._pending = queue.Queue()
+        self._pending_lock = threading.Lock()
+        self._committer = threading.Thread(target=self._commit_loop, daemon=True)
+        self._committer.start()
+    
+    @property
+    def version(self):
+        return self._snapshot.version
+    
+    def snapshot(self):
+        """Devuelve el snapshot vigente sin tomar ningún lock.
+        
+        ``hito_versions`` es de solo lectura; quien quiera modificar ``df`` debe trabajar
+        sobre ``df.copy(deep=False)`` (Copy-on-Write) y enviar los cambios con ``commit``.
+        """
+        return self._snapshot
+    
+    def commit(self, changes, base_version=None, skip_na=False, timeout=None):
+        """Encola una escritura y espera a que su grupo se publique.
+        
+        Los hitos modificados por otro commit posterior a ``base_version`` se reportan
+        como conflictos y no se aplican; el resto de la escritura sí se aplica.
+        Con ``base_version=None`` la escritura no se valida (último en escribir gana).
+        Lanza ``ValueError`` si algún valor no es compatible con su columna, y
+        ``TimeoutError`` si vence ``timeout`` antes de procesarse: en ese caso la
+        escritura se cancela y nunca se aplica.
+        """
+        hecho = threading.Event()
+        escritura = {"changes": changes, "base_version": base_version, "skip_na": skip_na,
+                     "hecho": hecho, "resultado": None, "error": None,
+                     "en_proceso": False, "cancelada": False}
+        self._pending.put(escritura)
+        if not hecho.wait(timeout):
+            with self._pending_lock:
+                if not escritura["en_proceso"]:
+                    escritura["cancelada"] = True
+                    raise TimeoutError("La escritura no se confirmó a tiempo y fue cancelada")
+            # El committer ya la tomó: su resultado es inminente
+            hecho.wait()
+        if escritura["error"] is not None:
+            raise ValueError(f"No se pudo confirmar la escritura: {escritura['error']}")
+        return escritura["resultado"]
+    
+    def apply_updates(self, updates):
+        """Aplica un lote de avances de campo (avance / mes_real) sin control de versión.
+        
+        Los registros repetidos de un mismo hito se combinan por columna (gana el último
+        valor no nulo de cada campo). Devuelve los ids aplicados.
+        """
+        combinados = updates.groupby('id', sort=False).last().reset_index()
+        return self.commit(combinados, skip_na=True).aplicados
+    
+    def _commit_loop(self):
+        while True:
+            grupo = [self._pending.get()]
+            while len(grupo) < self.max_group:
+                try:
+                    grupo.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            with self._pending_lock:
+                grupo = [escritura for escritura in grupo if not escritura["cancelada"]]
+                for escritura in grupo:
+                    escritura["en_proceso"] = True
+            if not grupo:
+                continue
+            try:
+                self._commit_group(grupo)
+            except Exception as e:
+                # El grupo no se publicó: las escrituras sin resultado final reciben el error
+                for escritura in grupo:
+                    if not isinstance(escritura["resultado"], CommitResult) and escritura["error"] is None:
+                        escritura["error"] = e
+            finally:
+                # Ninguna sesión puede quedar esperando, pase lo que pase con el grupo
+                for escritura in grupo:
+                    escritura["hecho"].set()
+    
+    def _commit_group(self, grupo):
+        """Valida cada escritura por hito y publica un único snapshot para todo el grupo"""
+        actual = self._snapshot
+        nueva_version = actual.version + 1
+        df = actual.df
+        # Las columnas tocadas se copian una vez y se modifican como arrays; el DataFrame se arma al final
+        columnas_nuevas = {}
+        hito_versions = actual.hito_versions.copy()
+        indice_ids = pd.Index(df['id'])
+        hubo_cambios = False
+        
+        for escritura in grupo:
+            changes = escritura["changes"]
+            # Se validan y convierten todos los valores antes de tocar el DataFrame del grupo,
+            # así una escritura inválida no deja cambios a medias
+            try:
+                ids = changes['id'].to_numpy()
+                filas = indice_ids.get_indexer(ids)
+                validas = filas >= 0
+                conflictos = []
+                if escritura["base_version"] is not None:
+                    en_conflicto = np.zeros(len(filas), dtype=bool)
+                    en_conflicto[validas] = hito_versions[filas[validas]] > escritura["base_version"]
+                    conflictos = ids[en_conflicto].tolist()
+                    validas &= ~en_conflicto
+                
+                asignaciones = []
+                for columna in changes.columns.drop('id'):
+                    mascara = validas & changes[columna].notna().to_numpy() if escritura["skip_na"] else validas
+                    valores = changes[columna][mascara].astype(df[columna].dtype).to_numpy()
+                    asignaciones.append((columna, filas[mascara], valores))
+            except Exception as e:
+                escritura["error"] = e
+                continue
+            
+            # Solo cuentan los valores que realmente cambian: un registro vacío o idéntico
+            # no publica versión ni marca el hito (no genera conflictos falsos)
+            escritas = []
+            for columna, filas_columna, valores in asignaciones:
+                actuales = (columnas_nuevas[columna] if columna in columnas_nuevas
+                            else df[columna].to_numpy())[filas_columna]
+                distintos = ~np.asarray((actuales == valores) | (pd.isna(actuales) & pd.isna(valores)), dtype=bool)
+                if not distintos.any():
+                    continue
+                if columna not in columnas_nuevas:
+                    columnas_nuevas[columna] = df[columna].to_numpy(copy=True)
+                columnas_nuevas[columna][filas_columna[distintos]] = valores[distintos]
+                escritas.append(filas_columna[distintos])
+            if escritas:
+                hito_versions[np.concatenate(escritas)] = nueva_version
+                hubo_cambios = True
+            escritura["resultado"] = (ids[validas].tolist(), conflictos)
+        
+        if hubo_cambios:
+            hito_versions.setflags(write=False)
+            self._snapshot = ProjectSnapshot(nueva_version, df.assign(**columnas_nuevas), hito_versions)
+        version = self._snapshot.version
+        self.stats["escrituras"] += len(grupo)
+        self.stats["commits"] += 1
+        for escritura in grupo:
+            if escritura["resultado"] is not None:
+                aplicados, conflictos = escritura["resultado"]
+                escritura["resultado"] = CommitResult(version, aplicados, conflictos)
+                self.stats["conflictos"] += len(conflictos)
+
+class FieldUpdateIngestor:
+    """Ingesta masiva de avances de campo: carpeta de entrada + endpoint HTTP local con micro-lotes.
+    
+    Los archivos deben escribirse con otro nombre (p. ej. ``avances.csv.tmp``) y renombrarse
+    al terminar; además se ignoran los modificados hace menos de ``poll_interval`` segundos.
+    """
+    
+    CAMPOS = ('id', 'avance', 'mes_real')
+    
+    def __init__(self, store, drop_dir=INGESTA_DIR, port=INGESTA_PUERTO, max_body_bytes=INGESTA_MAX_BYTES,
+                 batch_size=500, max_wait=0.5, queue_size=10000, poll_interval=2.0):
+        self.store = store
+        self.drop_dir = Path(drop_dir)
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        # Cola acotada: al llenarse bloquea la carpeta y rechaza el HTTP (backpressure)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"recibidos": 0, "aplicados": 0, "rechazados": 0, "lotes": 0}
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stop_applier = threading.Event()
+        self._server = None
+        self._server_thread = None
+        self._watcher = None
+        self._applier = None
+    
+    @classmethod
+    def parse_records(cls, text, formato):
+        """Convierte texto NDJSON o CSV en registros válidos; devuelve (registros, rechazados)"""
+        if formato == 'csv':
+            filas = pd.read_csv(io.StringIO(text)).to_dict('records')
+        else:
+            filas = []
+            for linea in text.splitlines():
+                if not linea.strip():
+                    continue
+                try:
+                    filas.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    filas.append(None)
+        
+        registros = []
+        rechazados = 0
+        for fila in filas:
+            try:
+                registro = {"id": int(fila["id"])}
+                avance = fila.get("avance")
+                mes_real = fila.get("mes_real")
+                if pd.notna(avance):
+                    registro["avance"] = min(max(int(avance), 0), 100)
+                if pd.notna(mes_real):
+                    registro["mes_real"] = min(max(int(mes_real), 1), 13)
+            except (TypeError, KeyError, ValueError, AttributeError, OverflowError):
+                rechazados += 1
+                continue
+            registros.append(registro)
+        return registros, rechazados
+    
+    def submit(self, registros, timeout=None):
+        """Encola registros; devuelve cuántos entraron antes de que la cola se llenara"""
+        aceptados = 0
+        for registro in registros:
+            try:
+                self.queue.put(registro, timeout=timeout)
+            except queue.Full:
+                break
+            aceptados += 1
+        self._count(recibidos=aceptados)
+        return aceptados
+    
+    def _count(self, **incrementos):
+        with self._stats_lock:
+            for clave, valor in incrementos.items():
+                self.stats[clave] += valor
+    
+    def start(self):
+        """Inicia el servidor HTTP, el observador de carpeta y el aplicador de lotes"""
+        self.drop_dir.mkdir(parents=True, exist_ok=True)
+        (self.drop_dir / "procesados").mkdir(exist_ok=True)
+        (self.drop_dir / "rechazados").mkdir(exist_ok=True)
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._make_handler())
+        # Hilos no-daemon para que server_close() espere a las peticiones en curso
+        self._server.daemon_threads = False
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._watcher = threading.Thread(target=self._watch_dir, daemon=True)
+        self._applier = threading.Thread(target=self._apply_loop, daemon=True)
+        for hilo in (self._server_thread, self._watcher, self._applier):
+            hilo.start()
+    
+    def stop(self):
+        """Detiene la ingesta: cierra las entradas y aplica lo que quedó en cola antes de salir"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server_thread.join()
+        if self._watcher is not None:
+            self._watcher.join()
+        # Con las entradas cerradas, el aplicador vacía la cola y termina
+        self._stop_applier.set()
+        if self._applier is not None:
+            self._applier.join()
+    
+    def _next_batch(self):
+        """Agrupa registros hasta llenar el lote o agotar la espera máxima"""
+        try:
+            lote = [self.queue.get(timeout=self.max_wait)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.max_wait
+        while len(lote) < self.batch_size:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.queue.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+    
+    def _apply_loop(self):
+        while not (self._stop_applier.is_set() and self.queue.empty()):
+            lote = self._next_batch()
+            if not lote:
+                continue
+            try:
+                aplicados = set(self.store.apply_updates(pd.DataFrame(lote, columns=self.CAMPOS)))
+            except (ValueError, TimeoutError):
+                self._count(rechazados=len(lote), lotes=1)
+                continue
+            # Se cuentan registros, no hitos: los repetidos combinados también se aplicaron
+            n_aplicados = sum(registro["id"] in aplicados for registro in lote)
+            self._count(aplicados=n_aplicados, rechazados=len(lote) - n_aplicados, lotes=1)
+    
+    def _watch_dir(self):
+        while not self._stop.is_set():
+            for archivo in sorted(self.drop_dir.glob("*")):
+                if self._stop.is_set():
+                    break
+                formato = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(archivo.suffix.lower())
+                if formato is None or not archivo.is_file():
+                    continue
+                try:
+                    # Un archivo modificado recientemente puede estar copiándose todavía
+                    if time.time() - archivo.stat().st_mtime < self.poll_interval:
+                        continue
+                    registros, rechazados = self.parse_records(archivo.read_text(encoding='utf-8'), formato)
+                except FileNotFoundError:
+                    continue
+                except Exception:
+                    # Archivo ilegible: se aparta para no reintentarlo en cada vuelta
+                    try:
+                        archivo.replace(self.drop_dir / "rechazados" / archivo.name)
+                    except OSError:
+                        pass
+                    continue
+                self._count(rechazados=rechazados)
+                # Si la cola está llena el observador espera, pero sin dejar de atender la parada
+                pendientes = registros
+                while pendientes and not self._stop.is_set():
+                    pendientes = pendientes[self.submit(pendientes, timeout=self.poll_interval):]
+                if pendientes:
+                    # Se detuvo a medias: el archivo queda en su lugar y se reprocesa al reiniciar
+                    # (las actualizaciones son idempotentes)
+                    break
+                try:
+                    archivo.replace(self.drop_dir / "procesados" / archivo.name)
+                except OSError:
+                    pass
+            self._stop.wait(self.poll_interval)
+    
+    def _make_handler(self):
+        ingestor = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/avances":
+                    self._responder(404, {"error": "ruta no encontrada"})
+                    return
+                try:
+                    longitud = int(self.headers["Content-Length"])
+                except (TypeError, ValueError):
+                    longitud = -1
+                if longitud < 0:
+                    self.close_connection = True
+                    self._responder(400, {"error": "Content-Length ausente o inválido"})
+                    return
+                if longitud > ingestor.max_body_bytes:
+                    # No se lee el cuerpo: se cierra la conexión tras responder
+                    self.close_connection = True
+                    self._responder(413, {"error": f"cuerpo mayor a {ingestor.max_body_bytes} bytes"})
+                    return
+                texto = self.rfile.read(longitud).decode('utf-8', errors='replace')
+                formato = 'csv' if 'csv' in self.headers.get("Content-Type", "") else 'ndjson'
+                try:
+                    registros, rechazados = ingestor.parse_records(texto, formato)
+                except (pd.errors.ParserError, pd.errors.EmptyDataError):
+                    self._responder(400, {"error": "CSV inválido o vacío"})
+                    return
+                ingestor._count(rechazados=rechazados)
+                aceptados = ingestor.submit(registros, timeout=1.0)
+                if aceptados < len(registros):
+                    # Backpressure: el cliente debe reenviar desde el primer registro no aceptado
+                    self._responder(503, {"aceptados": aceptados, "rechazados": rechazados},
+                                    {"Retry-After": "1"})
+                    return
+                self._responder(202, {"aceptados": aceptados, "rechazados": rechazados})
+            
+            def _responder(self, codigo, cuerpo, headers=None):
+                datos = json.dumps(cuerpo).encode('utf-8')
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                for clave, valor in (headers or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+@st.cache_resource
+def get_project_store():
+    """Store único compartido por todas las sesiones del servidor"""
+    return ProjectStore(ConstructionManager().df)
+
+@st.cache_resource
+def get_ingestion_control():
+    """Ingesta de campo única del servidor, visible y controlable desde cualquier sesión"""
+    return {"ingestor": None, "lock": threading.Lock()}
+
 def main():
+    store = get_project_store()
+    
     # Inicializar el gestor de construcción
     if 'construction_manager' not in st.session_state:
         st.session_state.construction_manager = ConstructionManager()
+        st.session_state.snapshot = store.snapshot()
     
     cm = st.session_state.construction_manager
+    # La sesión lee de su snapshot hasta guardar o actualizar; las lecturas no bloquean a nadie
+    snapshot = st.session_state.snapshot
+    cm.df = snapshot.df.copy(deep=False)
     
     # Header principal
     st.markdown("""
@@ -274,6 +691,43 @@ def main():
                 file_name=f"Icon_Bay_Torres_{torre}_{datetime.now().strftime('%Y%m%d')}.csv",
                 mime="text/csv"
             )
+        
+        st.header("🔄 Sincronización")
+        st.caption(f"Versión de datos {snapshot.version} (servidor: {store.version})")
+        if store.version > snapshot.version:
+            st.info("Hay cambios de otros usuarios o de la ingesta de campo.")
+        if st.button("🔄 Actualizar Datos", use_container_width=True):
+            st.session_state.snapshot = store.snapshot()
+            st.rerun()
+        
+        st.header("📡 Ingesta de Campo")
+        control = get_ingestion_control()
+        ingestor = control["ingestor"]
+        st.caption(f"Carpeta de entrada: {INGESTA_DIR.name}/ • Puerto local: {INGESTA_PUERTO}")
+        if ingestor is None:
+            if st.button("▶️ Iniciar Ingesta", use_container_width=True):
+                with control["lock"]:
+                    # Otra sesión pudo iniciarla mientras tanto
+                    if control["ingestor"] is None:
+                        ingestor = FieldUpdateIngestor(store)
+                        try:
+                            ingestor.start()
+                        except OSError as e:
+                            st.error(f"No se pudo iniciar la ingesta: {e}")
+                        else:
+                            control["ingestor"] = ingestor
+                if control["ingestor"] is not None:
+                    st.rerun()
+        else:
+            st.caption(f"POST http://127.0.0.1:{ingestor.port}/avances (NDJSON o CSV) • "
+                       f"{ingestor.queue.qsize()} en cola")
+            st.caption(" • ".join(f"{clave}: {valor}" for clave, valor in ingestor.stats.items()))
+            if st.button("⏹️ Detener Ingesta", use_container_width=True):
+                with control["lock"]:
+                    if control["ingestor"] is ingestor:
+                        ingestor.stop()
+                        control["ingestor"] = None
+                st.rerun()
     
     # Calcular KPIs
     kpis = cm.calculate_kpis()
@@ -433,6 +887,10 @@ def main():
     with tab2:
         st.header("📋 Gestión de Hitos")
         
+        if 'save_message' in st.session_state:
+            tipo, mensaje = st.session_state.pop('save_message')
+            getattr(st, tipo)(mensaje)
+        
         # Filtros y búsqueda
         col1, col2, col3 = st.columns(3)
         
@@ -509,13 +967,30 @@ def main():
         
         # Botón para guardar cambios
         if st.button("💾 Guardar Cambios", type="primary"):
-            # Actualizar los datos en el DataFrame principal
-            for idx, row in edited_df.iterrows():
-                original_idx = df_page.index[idx - start_idx] if idx >= start_idx else idx
-                if original_idx in cm.df.index:
-                    cm.df.loc[original_idx] = row
-            st.success("✅ Cambios guardados exitosamente!")
-            st.rerun()
+            # Solo se envían las filas modificadas, junto con la versión en que se basan
+            columnas = ["titulo", "categoria", "mes_programado", "mes_real", "avance"]
+            originales = df_page[columnas]
+            editados = edited_df[columnas]
+            modificadas = (~((editados == originales) | (editados.isna() & originales.isna()))).any(axis=1)
+            cambios = editados[modificadas].copy()
+            cambios.insert(0, 'id', df_page.loc[modificadas, 'id'])
+            
+            try:
+                resultado = store.commit(cambios, base_version=snapshot.version, timeout=10)
+            except (ValueError, TimeoutError) as e:
+                st.error(f"❌ No se pudieron guardar los cambios: {e}")
+            else:
+                if resultado.conflictos:
+                    hitos = ', '.join(map(str, resultado.conflictos))
+                    st.session_state.save_message = (
+                        'warning',
+                        f"⚠️ {len(resultado.aplicados)} hitos guardados. Los hitos {hitos} fueron "
+                        "modificados por otro usuario y no se guardaron; revise los datos actualizados."
+                    )
+                else:
+                    st.session_state.save_message = ('success', "✅ Cambios guardados exitosamente!")
+                st.session_state.snapshot = store.snapshot()
+                st.rerun()
     
     with tab3:
         st.header("📈 Análisis Avanzado")